@@ -7,6 +7,13 @@ from django.db import models
 from common.choices import Status
 
 
+class ActiveManager(models.Manager):
+    """Rows with an active status, newest first, like ``get_all_actives``."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(status=Status.ACTIVE).order_by("-pk")
+
+
 class BaseModelWithUID(models.Model):
     uid = models.UUIDField(
         default=uuid.uuid4,
@@ -0,0 +1,28 @@
+"""Custom parsers for the API"""
+import codecs
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser that decodes request bodies with orjson.
+
+    orjson only reads UTF-8, so a body sent with another charset is
+    decoded to text first, as the stock parser does.
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            data = stream.read()
+            if codecs.lookup(encoding).name != 'utf-8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except ValueError as exc:
+            # Covers orjson.JSONDecodeError and UnicodeDecodeError
+            raise ParseError('JSON parse error - %s' % str(exc))
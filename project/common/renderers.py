@@ -0,0 +1,63 @@
+"""Custom renderers for the API"""
+import math
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+# Used for the values orjson cannot encode natively (Decimal, lazy
+# strings, querysets) and for datetimes, so their format matches DRF's
+drf_encoder = JSONEncoder()
+
+
+def has_non_finite_float(data):
+    """Return True if ``data`` contains NaN or an infinite float anywhere."""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson.
+
+    Anything orjson would encode differently from the stock renderer goes
+    through the stock renderer instead:
+    - indented output, as requested by the browsable API or an ``indent``
+      media type parameter
+    - NaN and infinite floats, which orjson writes as ``null`` but the
+      stock renderer rejects with a ValueError when ``STRICT_JSON`` is on
+    - integers outside the 64-bit range, which orjson cannot encode
+
+    Float exponents are written without a plus sign (``1e16`` rather than
+    ``1e+16``). Both forms decode to the same number.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if self.strict and has_non_finite_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=drf_encoder.default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # orjson.JSONEncodeError is a TypeError. The stock renderer
+            # either encodes the value (big integers) or raises the same
+            # error DRF would.
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer so the output stays valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
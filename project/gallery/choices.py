@@ -25,6 +25,8 @@ class RequestType(TextChoices):
     SOUVENIR_REQUEST = 'souvenir_request', 'Souvenir Request'
     OTHER = 'other', 'Other'
 
+VIDEO_AUDIO_REQUEST_TYPES = (RequestType.VIDEO_REQUEST, RequestType.AUDIO_REQUEST)
+
 class EditType(TextChoices):
     PHOTO_EDITING = 'photo_editing', 'Photo Editing'
     VIDEO_EDITING = 'video_editing', 'Video Editing'
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-16 19:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='editrequest',
+            index=models.Index(fields=['request_type', 'created_at'], name='gallery_edi_request_d49f36_idx'),
+        ),
+    ]
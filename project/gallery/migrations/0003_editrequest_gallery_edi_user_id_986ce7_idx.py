@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-16 19:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0002_editrequest_gallery_edi_request_d49f36_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='editrequest',
+            index=models.Index(fields=['user', 'request_type', 'created_at'], name='gallery_edi_user_id_986ce7_idx'),
+        ),
+    ]
@@ -2,10 +2,12 @@
 
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 
 from common.helpers import unique_file_code, unique_request_code
-from common.models import BaseModelWithUID
+from common.models import ActiveManager, BaseModelWithUID
 from gallery.choices import FileTypes, RequestStatus, RequestType
+from gallery.signals import post_change_gallery_receiver
 
 User = get_user_model()
 
@@ -46,6 +48,9 @@ class Gallery(BaseModelWithUID):
         default=0.00
     )
 
+    objects = models.Manager()
+    active = ActiveManager()
+
     def save(self, *args, **kwargs):
         if not self.code:
             self.code = unique_file_code()
@@ -134,6 +139,10 @@ class EditRequest(BaseModelWithUID):
         verbose_name = "Edit Request"
         verbose_name_plural = "Edit Requests"
         ordering = ('-created_at',)
+        indexes = [
+            models.Index(fields=['request_type', 'created_at']),
+            models.Index(fields=['user', 'request_type', 'created_at']),
+        ]
 
 
 
@@ -203,3 +212,5 @@ class EditRequestGallery(models.Model):
         ordering = ('-edit_request__created_at',)
 
 
+post_save.connect(post_change_gallery_receiver, sender=Gallery)
+post_delete.connect(post_change_gallery_receiver, sender=Gallery)
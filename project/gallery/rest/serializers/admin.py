@@ -52,7 +52,7 @@ class DownloadRequestSerializer(serializers.Serializer):
     end_date = serializers.DateField()
     request_type = serializers.ChoiceField(
         choices=RequestType.choices,
-        required=True
+        required=False
     )
 
 
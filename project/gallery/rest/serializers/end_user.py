@@ -57,6 +57,7 @@ class EndUserEditRequestCreateSerializer(serializers.ModelSerializer):
             'request_status',
         ]
 
+    @transaction.atomic
     def create(self, validated_data):
         media_files = validated_data.pop('media_files')
         quantity = validated_data.pop('quantity')
@@ -67,15 +68,17 @@ class EndUserEditRequestCreateSerializer(serializers.ModelSerializer):
             request_type=RequestType.SOUVENIR_REQUEST,
             **validated_data
         )
-        for media_file in media_files:
-            file_type = media_file['gallery_uid'].file_type
-            EditRequestGallery.objects.create(
+        # Insert all the selected items in a single multi-row INSERT
+        EditRequestGallery.objects.bulk_create([
+            EditRequestGallery(
                 edit_request=edit_request,
                 gallery=media_file['gallery_uid'],
                 # individual_note=media_file['individual_note'],
                 quantity=quantity,
-                file_type=file_type
+                file_type=media_file['gallery_uid'].file_type
             )
+            for media_file in media_files
+        ])
         return edit_request
 
 
@@ -299,8 +302,11 @@ class VideoAudioEditRequestSerializer(serializers.ModelSerializer):
                 'file_type': FileTypes.VIDEO if edit_type == EditType.VIDEO_EDITING else FileTypes.AUDIO
             })
 
-        # Trigger the background task to process these files
-        handle_edit_request_file.delay(edit_request.id, files_data)
+        # Trigger the background task once the edit request row is committed,
+        # otherwise the worker can run before it is visible
+        transaction.on_commit(
+            lambda: handle_edit_request_file.delay(edit_request.id, files_data)
+        )
 
         # Process files in background with fallback to synchronous processing
         #     EditRequestGallery.objects.create(
@@ -1,9 +1,11 @@
-from django.urls import path, include
+from django.urls import path
 
 from .end_user import urlpatterns as end_user_urls
 from .admin import urlpatterns as admin_urls
 
-urlpatterns = [
-    path("", include(end_user_urls)),
-    path("/admin", include(admin_urls)),
-]
\ No newline at end of file
+# Admin routes are mounted under "/admin" directly rather than through a
+# nested include(), so resolving a gallery URL walks a single flat list.
+urlpatterns = end_user_urls + [
+    path("/admin" + str(pattern.pattern), pattern.callback, name=pattern.name)
+    for pattern in admin_urls
+]
@@ -11,6 +11,7 @@ from gallery.rest.views.admin import (
     AdminVideoAudioEditRequestRetrieveView,
     AdminVideoAudioEditRequestUpdateStatusView,
     EditRequestDownloadView,
+    EditRequestDownloadStatusView,
     AdminDownloadRequestView,
 )
 
@@ -50,6 +51,11 @@ urlpatterns = [
         EditRequestDownloadView.as_view(),
         name="edit-request-download"
     ),
+    path(
+        "/download/<str:task_id>",
+        EditRequestDownloadStatusView.as_view(),
+        name="edit-request-download-status"
+    ),
     path(
         "/download-requests",
         AdminDownloadRequestView.as_view(),
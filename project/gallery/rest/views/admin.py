@@ -1,13 +1,9 @@
-import csv
-import io
-import os
-import requests
-import zipfile
 from datetime import datetime
-from urllib.request import urlopen
 
-from django.db.models import Q
-from django.http import FileResponse
+from celery.result import AsyncResult
+from django.core.files.storage import default_storage
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
 from django.utils.timezone import make_aware
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.types import OpenApiTypes
@@ -17,9 +13,9 @@ from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 
 from common.permission import IsAdmin, IsSuperAdmin, CheckAnyPermission
-from gallery.choices import RequestType
+from gallery.choices import RequestType, VIDEO_AUDIO_REQUEST_TYPES
 from gallery.filters import GalleryFilter
-from gallery.models import Gallery, EditRequest
+from gallery.models import Gallery, EditRequest, EditRequestGallery
 from gallery.rest.serializers.admin import (
     GalleryDetailSerializer,
     GalleryUploadSerializer,
@@ -31,6 +27,14 @@ from gallery.rest.serializers.end_user import (
     SouvenirEditRequestListSerializer,
     EditRequestUpdateStatusSerializer
 )
+from gallery.tasks import build_edit_request_zip, get_download_edit_requests
+from gallery.utils import is_edit_request_download, remember_edit_request_download
+
+# Columns read by the admin edit request list serializers
+EDIT_REQUEST_LIST_FIELDS = (
+    'uid', 'code', 'description', 'special_note', 'request_status',
+    'request_type', 'desire_delivery_date', 'created_at',
+)
 
 
 @extend_schema(
@@ -46,9 +50,16 @@ class GalleryListCreateView(generics.ListCreateAPIView):
     permission_classes = (CheckAnyPermission,)
     filter_backends = [DjangoFilterBackend]
     filterset_class = GalleryFilter
+    filter_names = frozenset(GalleryFilter.base_filters)
     serializer_class = GalleryUploadSerializer
     queryset = Gallery.objects.all()
 
+    def filter_queryset(self, queryset):
+        # Skip building the FilterSet when no filter param is present
+        if self.filter_names.isdisjoint(self.request.query_params):
+            return queryset
+        return super().filter_queryset(queryset)
+
     def perform_create(self, serializer):
         user = self.request.user
         serializer.save(created_by=user, updated_by=user)
@@ -67,11 +78,7 @@ class GalleryRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Gallery.objects.all()
 
     def get_object(self):
-        uid = self.kwargs.get('uid')
-        try:
-            return Gallery.objects.get(uid=uid)
-        except Gallery.DoesNotExist:
-            raise NotFound
+        return get_object_or_404(Gallery, uid=self.kwargs.get('uid'))
 
     def perform_update(self, serializer):
         user = self.request.user
@@ -95,14 +102,9 @@ class AdminPhotoEditRequestView(generics.ListAPIView):
     serializer_class = EditRequestListSerializer
 
     def get_queryset(self, *args, **kwargs):
-        try:
-            return EditRequest.objects.filter(
-                request_type=RequestType.PHOTO_REQUEST
-            )
-        except EditRequest.DoesNotExist:
-            return Response({
-                'message': 'No edit requests found.'
-            }, status=status.HTTP_404_NOT_FOUND)
+        return EditRequest.objects.filter(
+            request_type=RequestType.PHOTO_REQUEST
+        ).only(*EDIT_REQUEST_LIST_FIELDS).prefetch_related('request_files')
 
 @extend_schema(
     summary="Photo edit request retrieve for Admin Users only",
@@ -117,16 +119,11 @@ class AdminPhotoEditRequestRetrieveView(generics.RetrieveAPIView):
     serializer_class = EditRequestListSerializer
 
     def get_object(self):
-        request_uid = self.kwargs['uid']
-        try:
-            return EditRequest.objects.get(
-                uid=request_uid,
-                request_type=RequestType.PHOTO_REQUEST
-            )
-        except EditRequest.DoesNotExist:
-            return Response({
-                'message': 'No edit requests found.'
-            }, status=status.HTTP_404_NOT_FOUND)
+        return get_object_or_404(
+            EditRequest,
+            uid=self.kwargs['uid'],
+            request_type=RequestType.PHOTO_REQUEST
+        )
 
 
 
@@ -174,15 +171,9 @@ class AdminVideoAudioEditRequestView(generics.ListAPIView):
     serializer_class = EditRequestListSerializer
 
     def get_queryset(self, *args, **kwargs):
-        try:
-            return EditRequest.objects.filter(
-                Q(request_type=RequestType.VIDEO_REQUEST) |
-                Q(request_type=RequestType.AUDIO_REQUEST)
-            )
-        except EditRequest.DoesNotExist:
-            return Response({
-                'message': 'No edit requests found.'
-            }, status=status.HTTP_404_NOT_FOUND)
+        return EditRequest.objects.filter(
+            request_type__in=VIDEO_AUDIO_REQUEST_TYPES
+        ).only(*EDIT_REQUEST_LIST_FIELDS).prefetch_related('request_files')
 
 @extend_schema(
     summary="Video and Audio edit request retrieve for Admin Users only",
@@ -197,18 +188,11 @@ class AdminVideoAudioEditRequestRetrieveView(generics.RetrieveAPIView):
     serializer_class = EditRequestListSerializer
 
     def get_object(self):
-        request_uid = self.kwargs['uid']
-        try:
-            return EditRequest.objects.get(
-                Q(uid=request_uid) & (
-                        Q(request_type=RequestType.VIDEO_REQUEST) |
-                        Q(request_type=RequestType.AUDIO_REQUEST)
-                )
-            )
-        except EditRequest.DoesNotExist:
-            return Response({
-                'message': 'No edit requests found.'
-            }, status=status.HTTP_404_NOT_FOUND)
+        return get_object_or_404(
+            EditRequest,
+            uid=self.kwargs['uid'],
+            request_type__in=VIDEO_AUDIO_REQUEST_TYPES
+        )
 
 
 @extend_schema(
@@ -228,10 +212,8 @@ class AdminVideoAudioEditRequestUpdateStatusView(generics.UpdateAPIView):
         request_uid = self.kwargs.get('uid')
         try:
             obj = EditRequest.objects.get(
-                Q(uid=request_uid) & (
-                        Q(request_type=RequestType.VIDEO_REQUEST) |
-                        Q(request_type=RequestType.AUDIO_REQUEST)
-                )
+                uid=request_uid,
+                request_type__in=VIDEO_AUDIO_REQUEST_TYPES
             )
             return obj
         except EditRequest.DoesNotExist:
@@ -257,17 +239,15 @@ class AdminSouvenirRequestView(generics.ListAPIView):
     serializer_class = SouvenirEditRequestListSerializer
 
     def get_queryset(self, *args, **kwargs):
-        try:
-            return EditRequest.objects.filter(
-                request_type=RequestType.SOUVENIR_REQUEST
+        return EditRequest.objects.filter(
+            request_type=RequestType.SOUVENIR_REQUEST
+        ).only(*EDIT_REQUEST_LIST_FIELDS).prefetch_related(
+            Prefetch(
+                'request_files',
+                queryset=EditRequestGallery.objects.select_related('gallery')
             )
-        except EditRequest.DoesNotExist:
-            return Response({
-                'message': 'No edit requests found.'
-            }, status=status.HTTP_404_NOT_FOUND)
-
+        )
 
-import concurrent.futures
 
 @extend_schema(
     summary="Download edit requests for Admin Users only",
@@ -297,7 +277,8 @@ import concurrent.futures
         ),
     ],
     responses={
-        200: OpenApiResponse(description='Zip file containing all edit requests'),
+        202: OpenApiResponse(description='ZIP build queued; poll the returned task_id for the download URL. The task id and archive expire after a day'),
+        404: OpenApiResponse(description='No edit requests found'),
         400: OpenApiResponse(description='Invalid input data'),
         403: OpenApiResponse(description='Permission denied')
     }
@@ -311,64 +292,43 @@ class EditRequestDownloadView(generics.GenericAPIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        start_date = make_aware(datetime.combine(serializer.validated_data['start_date'], datetime.min.time()))
-        end_date = make_aware(datetime.combine(serializer.validated_data['end_date'], datetime.max.time()))
+        start_date = serializer.validated_data['start_date']
+        end_date = serializer.validated_data['end_date']
         request_type = serializer.validated_data.get('request_type')
 
-        requests_items = EditRequest.objects.filter(
-            created_at__range=(start_date, end_date),
-            request_type=request_type if request_type else None
-        ).prefetch_related('request_files__gallery')
-
-        if not requests_items.exists():
+        if not get_download_edit_requests(start_date, end_date, request_type).exists():
             return Response({'message': 'No edit requests found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-            for req in requests_items:
-                folder_name = f"{req.uid}/"
-                files = req.request_files.all()
-
-                # CSV data
-                csv_buffer = io.StringIO()
-                csv_writer = csv.writer(csv_buffer)
-                csv_writer.writerow([
-                    'title', 'special_note', 'description', 'request_status', 'desire_delivery_date',
-                    'request_type', 'shipping_address', 'additional_notes', 'file_urls'
-                ])
-                file_urls = ';'.join([f.user_request_file.url for f in files if f.user_request_file])
-                csv_writer.writerow([
-                    req.title, req.special_note, req.description, req.request_status,
-                    req.desire_delivery_date, req.request_type, req.shipping_address,
-                    req.additional_notes, file_urls
-                ])
-                zip_file.writestr(folder_name + 'data.csv', csv_buffer.getvalue())
-
-                # Download files in parallel
-                def download_file(f):
-                    if f.user_request_file and f.user_request_file.url:
-                        try:
-                            response = requests.get(f.user_request_file.url, timeout=10)
-                            response.raise_for_status()
-                            filename = os.path.basename(f.user_request_file.name)
-                            return (filename, response.content)
-                        except Exception as e:
-                            print(f"Error downloading {f.user_request_file.url}: {str(e)}")
-                    return None
-
-                with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-                    future_to_file = {executor.submit(download_file, f): f for f in files}
-                    for future in concurrent.futures.as_completed(future_to_file):
-                        result = future.result()
-                        if result:
-                            filename, content = result
-                            zip_file.writestr(folder_name + filename, content)
-
-        zip_buffer.seek(0)
-        filename = f"{serializer.validated_data['start_date']}_to_{serializer.validated_data['end_date']}.zip"
-        response = FileResponse(zip_buffer, content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+        # Build the archive in a worker so the web process is free right away
+        task = build_edit_request_zip.delay(start_date.isoformat(), end_date.isoformat(), request_type)
+        remember_edit_request_download(task.id)
+        return Response({'task_id': task.id}, status=status.HTTP_202_ACCEPTED)
+
+
+@extend_schema(
+    summary="Check a ZIP download for Admin Users only",
+    tags=["Admin"],
+    responses={
+        200: OpenApiResponse(description='Build status, with a download URL once the ZIP is ready'),
+        403: OpenApiResponse(description='Permission denied'),
+        404: OpenApiResponse(description='Unknown or expired ZIP download')
+    }
+)
+class EditRequestDownloadStatusView(generics.GenericAPIView):
+    available_permission_classes = (IsAdmin, IsSuperAdmin)
+    permission_classes = (CheckAnyPermission,)
+
+    def get(self, request, task_id):
+        # Only archive builds issued by EditRequestDownloadView are reported.
+        # Any other id would otherwise read as PENDING forever.
+        if not is_edit_request_download(task_id):
+            raise NotFound(detail="Download not found")
+        result = AsyncResult(task_id)
+        data = {'task_id': task_id, 'status': result.status}
+        if result.successful() and isinstance(result.result, dict) and 'file' in result.result:
+            # Sign the URL on every poll so it never expires before it is used
+            data['url'] = default_storage.url(result.result['file'])
+        return Response(data, status=status.HTTP_200_OK)
 
 from django.utils.dateparse import parse_datetime
 from django.utils.timezone import make_aware, is_naive
@@ -1,4 +1,10 @@
-from django.db.models import Q
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema
 from rest_framework import generics, status
@@ -10,7 +16,7 @@ from common.permission import (
     IsEndUser,
     IsSuperAdmin,
 )
-from gallery.choices import FileTypes, RequestType
+from gallery.choices import FileTypes, RequestType, VIDEO_AUDIO_REQUEST_TYPES
 from gallery.filters import GalleryFilter
 from gallery.models import EditRequest, Gallery
 from gallery.rest.serializers.end_user import (
@@ -22,6 +28,45 @@ from gallery.rest.serializers.end_user import (
     EditRequestListSerializer,
     VideoAudioEditRequestSerializer,
 )
+from gallery.utils import get_gallery_list_version
+
+GALLERY_LIST_CACHE_TIMEOUT = 60 * 5
+
+
+def gallery_list_cache_key(request):
+    return f"gallery:list:{get_gallery_list_version()}:{request.build_absolute_uri()}"
+
+
+def gallery_list_etag(request, *args, **kwargs):
+    # The tag is stored next to the cached page, so it names one rendering
+    # of one URL and expires with it. Clients never keep signed file URLs
+    # longer than the cached page does.
+    return cache.get(f"{gallery_list_cache_key(request)}:etag")
+
+
+class CachedGalleryListMixin:
+    """Serve active gallery lists from the cache and answer 304s.
+
+    Every end user sees the same active items, so one entry per URL is
+    shared by all of them. Saving or deleting a gallery item bumps the
+    version in the key, which drops both the cached pages and their ETags.
+    """
+
+    @method_decorator(condition(etag_func=gallery_list_etag))
+    def list(self, request, *args, **kwargs):
+        cache_key = gallery_list_cache_key(request)
+        etag_key = f"{cache_key}:etag"
+        cached = cache.get_many([cache_key, etag_key])
+        data, etag = cached.get(cache_key), cached.get(etag_key)
+        if data is None or etag is None:
+            data = super().list(request, *args, **kwargs).data
+            etag = '"%s"' % hashlib.md5(f"{cache_key}:{time.time()}".encode()).hexdigest()
+            cache.set_many({cache_key: data, etag_key: etag}, GALLERY_LIST_CACHE_TIMEOUT)
+        response = Response(data)
+        # condition() only adds the tag it found before the view ran, which
+        # is None for a page rendered on this request
+        response['ETag'] = etag
+        return response
 
 
 @extend_schema(
@@ -58,12 +103,11 @@ class EndUserEditRequestRetrieveView(generics.RetrieveAPIView):
     )
     permission_classes = (CheckAnyPermission,)
     serializer_class = EndUserEditRequestRetrieveSerializer
-    lookup_field = 'uid'
-
 
-    def get_queryset(self, *args, **kwargs):
-        return EditRequest.objects.filter(
-            # uid=self.kwargs['uid'],
+    def get_object(self):
+        return get_object_or_404(
+            EditRequest.objects.prefetch_related('request_files__gallery'),
+            uid=self.kwargs['uid'],
             user=self.request.user
         )
 
@@ -71,7 +115,7 @@ class EndUserEditRequestRetrieveView(generics.RetrieveAPIView):
     summary="Get all active items from the gallery, Filter included",
     tags=["End User"]
 )
-class EndUserGalleyListView(generics.ListAPIView):
+class EndUserGalleyListView(CachedGalleryListMixin, generics.ListAPIView):
     available_permission_classes = (
         IsSuperAdmin,
         IsAdmin,
@@ -83,14 +127,14 @@ class EndUserGalleyListView(generics.ListAPIView):
     serializer_class = SimpleGallerySerializer
 
     def get_queryset(self, *args, **kwargs):
-        return Gallery().get_all_actives()
+        return Gallery.active.all()
 
 
 @extend_schema(
     summary="Get all active images from the gallery",
     tags=["End User"]
 )
-class EndUserGalleyImageListView(generics.ListAPIView):
+class EndUserGalleyImageListView(CachedGalleryListMixin, generics.ListAPIView):
     available_permission_classes = (
         IsSuperAdmin,
         IsAdmin,
@@ -100,7 +144,7 @@ class EndUserGalleyImageListView(generics.ListAPIView):
     serializer_class = SimpleGallerySerializer
 
     def get_queryset(self, *args, **kwargs):
-        return Gallery().get_all_actives().filter(
+        return Gallery.active.filter(
             file_type=FileTypes.IMAGE
         )
 
@@ -122,15 +166,10 @@ class EndUserPhotoEditRequestView(generics.ListCreateAPIView):
         return EditRequestListSerializer
 
     def get_queryset(self, *args, **kwargs):
-        try:
-            return EditRequest.objects.filter(
-                user=self.request.user,
-                request_type=RequestType.PHOTO_REQUEST
-            )
-        except EditRequest.DoesNotExist:
-            return Response({
-                'message': 'No edit requests found for this user.'
-            }, status=status.HTTP_404_NOT_FOUND)
+        return EditRequest.objects.filter(
+            user=self.request.user,
+            request_type=RequestType.PHOTO_REQUEST
+        )
 
     def post(self, request):
         serializer = PhotoEditRequestSerializer(
@@ -158,17 +197,12 @@ class EndUserPhotoEditRequestRetrieveView(generics.RetrieveAPIView):
     serializer_class = EditRequestListSerializer
 
     def get_object(self):
-        request_uid = self.kwargs['uid']
-        try:
-            return EditRequest.objects.get(
-                uid=request_uid,
-                user=self.request.user,
-                request_type=RequestType.PHOTO_REQUEST
-            )
-        except EditRequest.DoesNotExist:
-            return Response({
-                'message': 'No edit requests found.'
-            }, status=status.HTTP_404_NOT_FOUND)
+        return get_object_or_404(
+            EditRequest.objects.prefetch_related('request_files'),
+            uid=self.kwargs['uid'],
+            user=self.request.user,
+            request_type=RequestType.PHOTO_REQUEST
+        )
 
 
 @extend_schema(
@@ -189,17 +223,10 @@ class EndUserVideoAudioEditRequestView(generics.ListCreateAPIView):
         return EditRequestListSerializer
 
     def get_queryset(self, *args, **kwargs):
-        try:
-            return EditRequest.objects.filter(
-                user=self.request.user
-                ).filter(
-                    Q(request_type=RequestType.VIDEO_REQUEST) |
-                    Q(request_type=RequestType.AUDIO_REQUEST)
-                )
-        except EditRequest.DoesNotExist:
-            return Response({
-                'message': 'No edit requests found for this user.'
-            }, status=status.HTTP_404_NOT_FOUND)
+        return EditRequest.objects.filter(
+            user=self.request.user,
+            request_type__in=VIDEO_AUDIO_REQUEST_TYPES
+        ).prefetch_related('request_files')
 
     def post(self, request):
         serializer = VideoAudioEditRequestSerializer(
@@ -227,13 +254,8 @@ class EndUserVideoAudioEditRequestRetrieveView(generics.RetrieveAPIView):
     serializer_class = EditRequestListSerializer
 
     def get_object(self):
-        request_uid = self.kwargs['uid']
-        try:
-            return EditRequest.objects.get(
-                uid=request_uid,
-                user=self.request.user
-            )
-        except EditRequest.DoesNotExist:
-            return Response({
-                'message': 'No edit requests found.'
-            }, status=status.HTTP_404_NOT_FOUND)
+        return get_object_or_404(
+            EditRequest.objects.prefetch_related('request_files'),
+            uid=self.kwargs['uid'],
+            user=self.request.user
+        )
@@ -0,0 +1,6 @@
+from gallery.utils import bump_gallery_list_version
+
+
+def post_change_gallery_receiver(sender, instance, **kwargs):
+    # Cached gallery lists and their ETags are keyed on this version
+    bump_gallery_list_version()
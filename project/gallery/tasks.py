@@ -1,32 +1,107 @@
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta
+
 from celery import shared_task
 from django.core.files.base import File
 from django.core.files.storage import default_storage
 from django.core.mail import send_mail, EmailMultiAlternatives
 from django.conf import settings
+from django.db import OperationalError
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.timezone import make_aware
 
 from gallery.models import EditRequest, EditRequestGallery
+from gallery.utils import (
+    EDIT_REQUEST_DOWNLOAD_DIR,
+    EDIT_REQUEST_DOWNLOAD_TIMEOUT,
+    write_edit_request_zip,
+)
 
+# Columns written to each data.csv, plus the uid used as the folder name
+EDIT_REQUEST_ZIP_FIELDS = (
+    'uid', 'title', 'special_note', 'description', 'request_status',
+    'desire_delivery_date', 'request_type', 'shipping_address', 'additional_notes',
+)
 
-@shared_task
+
+def get_download_edit_requests(start_date, end_date, request_type=None):
+    start = make_aware(datetime.combine(start_date, datetime.min.time()))
+    end = make_aware(datetime.combine(end_date, datetime.max.time()))
+
+    # Load only the columns written to the archive. The gallery relation
+    # is never read here, and file order inside a folder does not matter,
+    # so the default ordering join on edit_request is dropped as well.
+    requests_items = EditRequest.objects.filter(
+        created_at__range=(start, end),
+    ).only(*EDIT_REQUEST_ZIP_FIELDS).prefetch_related(
+        Prefetch(
+            'request_files',
+            queryset=EditRequestGallery.objects.only(
+                'id', 'edit_request_id', 'user_request_file'
+            ).order_by()
+        )
+    )
+    if request_type:
+        requests_items = requests_items.filter(request_type=request_type)
+    return requests_items
+
+
+# The rows go in with one atomic insert, so a retry never finds half of them
+@shared_task(ignore_result=True, autoretry_for=(OperationalError,), retry_backoff=True, max_retries=5)
 def handle_edit_request_file(edit_request_id, files_data):
-    edit_request = EditRequest.objects.get(id=edit_request_id)
-    for file_data in files_data:
-        with default_storage.open(file_data['path'], 'rb') as f:
-            django_file = File(f, name=file_data['path'].split('/')[-1])
-            EditRequestGallery.objects.create(
-                edit_request=edit_request,
-                user_request_file=django_file,
-                file_type=file_data['file_type']
-            )
+    # The serializer already saved each upload to storage, so the rows just
+    # reference those objects instead of reading and copying them again
+    EditRequestGallery.objects.bulk_create([
+        EditRequestGallery(
+            edit_request_id=edit_request_id,
+            user_request_file=file_data['path'],
+            file_type=file_data['file_type']
+        )
+        for file_data in files_data
+    ], batch_size=100)
+
 
-    return "Edit request processed successfully."
+@shared_task
+def build_edit_request_zip(start_date, end_date, request_type=None):
+    requests_items = get_download_edit_requests(
+        date.fromisoformat(start_date), date.fromisoformat(end_date), request_type
+    )
+    with tempfile.TemporaryFile() as archive:
+        write_edit_request_zip(archive, requests_items.iterator(chunk_size=200))
+        archive.seek(0)
+        name = default_storage.save(
+            f"{EDIT_REQUEST_DOWNLOAD_DIR}/{start_date}_to_{end_date}_{uuid.uuid4().hex}.zip",
+            File(archive)
+        )
+    return {'file': name}
+
+
+@shared_task
+def delete_expired_edit_request_downloads():
+    """Deletes ZIP archives built for downloads whose status key has expired."""
+    threshold = timezone.now() - timedelta(seconds=EDIT_REQUEST_DOWNLOAD_TIMEOUT)
+    try:
+        _, file_names = default_storage.listdir(EDIT_REQUEST_DOWNLOAD_DIR)
+    except FileNotFoundError:
+        file_names = []
+
+    deleted_count = 0
+    for file_name in file_names:
+        name = f"{EDIT_REQUEST_DOWNLOAD_DIR}/{file_name}"
+        if default_storage.get_modified_time(name) < threshold:
+            default_storage.delete(name)
+            deleted_count += 1
 
+    return f"Deleted {deleted_count} expired edit request downloads."
 
-@shared_task()
+
+@shared_task(ignore_result=True)
 def print_something():
     print("Hello, world!")
 
-@shared_task
+@shared_task(ignore_result=True)
 def send_mail_task(subject, text_content, html_content, to_email):
     email = EmailMultiAlternatives(
         subject=subject,
@@ -35,4 +110,4 @@ def send_mail_task(subject, text_content, html_content, to_email):
         to=[to_email],
     )
     email.attach_alternative(html_content, "text/html")
-    email.send()
\ No newline at end of file
+    email.send()
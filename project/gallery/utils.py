@@ -1,29 +1,181 @@
+import concurrent.futures
+import csv
+import io
+import logging
 import mimetypes
 import os
+import shutil
+import uuid
+import zipfile
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from rest_framework.exceptions import ValidationError
 from gallery.choices import FileTypes
 
+logger = logging.getLogger(__name__)
+
+GALLERY_LIST_VERSION_KEY = "gallery:list-version"
+
+# ZIP builds started by the admin download endpoint. The status endpoint
+# only answers for task ids recorded under this key, and the cleanup task
+# deletes archives once they are older than the same timeout.
+EDIT_REQUEST_DOWNLOAD_KEY = "gallery:edit-request-download:{}"
+EDIT_REQUEST_DOWNLOAD_TIMEOUT = 60 * 60 * 24
+EDIT_REQUEST_DOWNLOAD_DIR = "edit-request-downloads"
+
+# Attachments prefetched ahead of the archive writer. Each one holds an
+# open handle and at most AWS_S3_MAX_MEMORY_SIZE of memory, so this count
+# bounds the memory of an archive build.
+ZIP_DOWNLOAD_WORKERS = 8
+ZIP_DOWNLOAD_BACKLOG = ZIP_DOWNLOAD_WORKERS * 2
+ZIP_COPY_CHUNK_SIZE = 1024 * 1024
+
+EDIT_REQUEST_CSV_HEADER = (
+    'title', 'special_note', 'description', 'request_status', 'desire_delivery_date',
+    'request_type', 'shipping_address', 'additional_notes', 'file_urls',
+)
+
+EXPECTED_MIME_PREFIX = {
+    FileTypes.IMAGE: 'image',
+    FileTypes.AUDIO: 'audio',
+    FileTypes.VIDEO: 'video',
+    FileTypes.PDF: 'application/pdf',
+    FileTypes.DOCX: 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    FileTypes.PPTX: 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    FileTypes.XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Load the system MIME tables once and expand each expected prefix into the
+# set of extensions it covers, so validation is one membership test
+mimetypes.init()
+ALLOWED_EXTENSIONS = {
+    file_type: frozenset(
+        extension for extension, mime_type in mimetypes.types_map.items()
+        if mime_type.startswith(prefix)
+    )
+    for file_type, prefix in EXPECTED_MIME_PREFIX.items()
+}
+
 
 def validate_file_matches_type(file, file_type):
     if file_type == FileTypes.OTHER or not file:
         return  # Skip validation for "other" or missing file
 
     extension = os.path.splitext(file.name)[1].lower()
-    mime_type, _ = mimetypes.guess_type(file.name)
-
-    expected_mime_prefix = {
-        FileTypes.IMAGE: 'image',
-        FileTypes.AUDIO: 'audio',
-        FileTypes.VIDEO: 'video',
-        FileTypes.PDF: 'application/pdf',
-        FileTypes.DOCX: 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-        FileTypes.PPTX: 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-        FileTypes.XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    }
-
-    expected = expected_mime_prefix.get(file_type)
-    if expected:
-        if not mime_type or not mime_type.startswith(expected):
-            raise ValidationError(
-                f"Uploaded file type ('{mime_type}') does not match the declared file_type '{file_type}'."
-            )
\ No newline at end of file
+
+    allowed = ALLOWED_EXTENSIONS.get(file_type)
+    if allowed is not None and extension not in allowed:
+        mime_type = mimetypes.types_map.get(extension)
+        raise ValidationError(
+            f"Uploaded file type ('{mime_type}') does not match the declared file_type '{file_type}'."
+        )
+
+
+def _open_request_file(f):
+    """Open one attachment straight from the storage backend and start its download."""
+    if f.user_request_file:
+        name = f.user_request_file.name
+        source = None
+        try:
+            source = f.user_request_file.storage.open(name, 'rb')
+            # S3 fetches the object on first read; do that here in the worker.
+            # It spools to disk past AWS_S3_MAX_MEMORY_SIZE, so only a small
+            # buffer per prefetched file stays in memory.
+            source.read(0)
+            return (name, source)
+        except Exception as e:
+            if source is not None:
+                source.close()
+            logger.warning("Error reading %s: %s", name, e)
+    return None
+
+
+def _copy_request_file(zip_file, arcname, name, source):
+    """Copy an open attachment into the archive without holding it in memory."""
+    try:
+        with source, zip_file.open(arcname, 'w', force_zip64=True) as target:
+            shutil.copyfileobj(source, target, ZIP_COPY_CHUNK_SIZE)
+    except Exception as e:
+        logger.warning("Error reading %s: %s", name, e)
+
+
+def write_edit_request_zip(archive, requests_items):
+    """Write an edit request archive into the seekable file ``archive``."""
+    # One pool for the whole download so reads overlap across requests.
+    # Media is already compressed, so it is stored as-is; only the CSVs deflate.
+    with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zip_file, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=ZIP_DOWNLOAD_WORKERS) as executor:
+        pending = {}
+
+        def write_completed(limit):
+            while len(pending) > limit:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    folder_name = pending.pop(future)
+                    result = future.result()
+                    if result:
+                        name, source = result
+                        _copy_request_file(
+                            zip_file, folder_name + os.path.basename(name), name, source
+                        )
+
+        # One buffer and writer serve every per-request data.csv; only
+        # the header and a single row are rewritten into it each time
+        csv_buffer = io.StringIO()
+        csv_writer = csv.writer(csv_buffer)
+        csv_writer.writerow(EDIT_REQUEST_CSV_HEADER)
+        csv_header = csv_buffer.getvalue()
+        # Attachments use the default storage, so resolve its url method
+        # once instead of going through the file descriptor per file
+        storage_url = default_storage.url
+
+        for req in requests_items:
+            folder_name = f"{req.uid}/"
+            files = req.request_files.all()
+
+            # CSV data
+            csv_buffer.seek(len(csv_header))
+            csv_buffer.truncate()
+            file_urls = ';'.join([
+                storage_url(f.user_request_file.name) for f in files if f.user_request_file
+            ])
+            csv_writer.writerow([
+                req.title, req.special_note, req.description, req.request_status,
+                req.desire_delivery_date, req.request_type, req.shipping_address,
+                req.additional_notes, file_urls
+            ])
+            zip_file.writestr(
+                folder_name + 'data.csv', csv_buffer.getvalue(),
+                compress_type=zipfile.ZIP_DEFLATED, compresslevel=1
+            )
+
+            for f in files:
+                pending[executor.submit(_open_request_file, f)] = folder_name
+                write_completed(ZIP_DOWNLOAD_BACKLOG)
+
+        write_completed(0)
+
+
+def get_gallery_list_version():
+    """Return the token that changes whenever a gallery item changes."""
+    version = cache.get(GALLERY_LIST_VERSION_KEY)
+    if version is None:
+        cache.add(GALLERY_LIST_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(GALLERY_LIST_VERSION_KEY)
+    return version
+
+
+def bump_gallery_list_version():
+    cache.set(GALLERY_LIST_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def remember_edit_request_download(task_id):
+    cache.set(EDIT_REQUEST_DOWNLOAD_KEY.format(task_id), True, EDIT_REQUEST_DOWNLOAD_TIMEOUT)
+
+
+def is_edit_request_download(task_id):
+    """Return True if ``task_id`` is a ZIP build issued in the last day."""
+    return cache.get(EDIT_REQUEST_DOWNLOAD_KEY.format(task_id), False)
@@ -2,6 +2,22 @@ from django.contrib import admin
 from .models import SubscriptionPlan, PaymentHistory, TransactionToken
 
 
+class ChangelistOnlyMixin:
+    """Load just ``changelist_only_fields`` for changelist rows.
+
+    The change form and delete pages still get full rows, so they do not
+    fall back to one query per deferred column.
+    """
+    changelist_only_fields = ()
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        match = request.resolver_match
+        if self.changelist_only_fields and match and match.url_name.endswith('_changelist'):
+            qs = qs.only(*self.changelist_only_fields)
+        return qs
+
+
 @admin.register(SubscriptionPlan)
 class SubscriptionPlanAdmin(admin.ModelAdmin):
     list_display = ('name', 'amount', 'currency', 'period', 'is_active', 'created_at')
@@ -27,7 +43,7 @@ class SubscriptionPlanAdmin(admin.ModelAdmin):
 
 
 @admin.register(TransactionToken)
-class TransactionTokenAdmin(admin.ModelAdmin):
+class TransactionTokenAdmin(ChangelistOnlyMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'token_type', 'payment_type', 'card_brand', 
                     'card_last_four', 'is_active', 'mode', 'created_at')
     list_filter = ('token_type', 'payment_type', 'is_active', 'mode', 'card_brand', 
@@ -35,7 +51,12 @@ class TransactionTokenAdmin(admin.ModelAdmin):
     search_fields = ('user__email', 'univapay_token_id', 'email', 'card_last_four')
     readonly_fields = ('created_at', 'updated_at', 'last_used_at', 'raw_token_data')
     list_per_page = 25
+    # Skip the unfiltered COUNT(*) on every filtered changelist page
+    show_full_result_count = False
     date_hierarchy = 'created_at'
+    list_select_related = ('user',)
+    changelist_only_fields = ('id', 'user__email', 'univapay_token_id', 'token_type', 'payment_type',
+                              'card_brand', 'card_last_four', 'is_active', 'mode', 'created_at')
     
     fieldsets = (
         ('Basic Information', {
@@ -60,14 +81,10 @@ class TransactionTokenAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at', 'last_used_at')
         })
     )
-    
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.select_related('user')
 
 
 @admin.register(PaymentHistory)
-class PaymentHistoryAdmin(admin.ModelAdmin):
+class PaymentHistoryAdmin(ChangelistOnlyMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'payment_type', 'amount', 'currency', 
                     'status', 'mode', 'is_successful', 'created_at')
     list_filter = ('payment_type', 'status', 'mode', 'currency', 
@@ -77,6 +94,12 @@ class PaymentHistoryAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at', 'raw_json', 'is_successful')
     date_hierarchy = 'created_at'
     list_per_page = 25
+    # Skip the unfiltered COUNT(*) on every filtered changelist page
+    show_full_result_count = False
+    # Only the user is rendered per row; the token and plan are not shown
+    list_select_related = ('user',)
+    changelist_only_fields = ('id', 'user__email', 'payment_type', 'amount', 'currency',
+                              'status', 'mode', 'created_at')
     
     fieldsets = (
         ('Basic Information', {
@@ -134,10 +157,6 @@ class PaymentHistoryAdmin(admin.ModelAdmin):
         })
     )
     
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.select_related('user', 'transaction_token', 'subscription_plan')
-    
     def is_successful(self, obj):
         """Display success status with color coding"""
         if obj.is_successful():
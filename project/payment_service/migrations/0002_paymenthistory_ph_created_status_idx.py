@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-16 19:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_service', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymenthistory',
+            index=models.Index(fields=['-created_at', 'status'], name='ph_created_status_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-16 19:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_service', '0002_paymenthistory_ph_created_status_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transactiontoken',
+            name='payment_ser_user_id_a50547_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transactiontoken',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user'], name='txntoken_user_active_partial'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-16 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_service', '0003_remove_transactiontoken_payment_ser_user_id_a50547_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='paymenthistory',
+            name='payment_ser_univapa_155d2e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transactiontoken',
+            name='payment_ser_univapa_4ff2b1_idx',
+        ),
+        migrations.AlterField(
+            model_name='transactiontoken',
+            name='univapay_token_id',
+            field=models.UUIDField(unique=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-16 19:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_service', '0004_remove_paymenthistory_payment_ser_univapa_155d2e_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='paymenthistory',
+            name='payment_ser_transac_6ee21d_idx',
+        ),
+        migrations.AddIndex(
+            model_name='paymenthistory',
+            index=models.Index(fields=['transaction_token', 'status', '-created_at'], name='pmt_txn_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-16 19:42
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_card_snapshot(apps, schema_editor):
+    PaymentHistory = apps.get_model('payment_service', 'PaymentHistory')
+    TransactionToken = apps.get_model('payment_service', 'TransactionToken')
+    token = TransactionToken.objects.filter(pk=OuterRef('transaction_token_id'))
+    PaymentHistory.objects.filter(transaction_token__isnull=False).update(
+        card_brand_snapshot=Subquery(token.values('card_brand')[:1]),
+        card_last_four_snapshot=Subquery(token.values('card_last_four')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_service', '0005_remove_paymenthistory_payment_ser_transac_6ee21d_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymenthistory',
+            name='card_brand_snapshot',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='paymenthistory',
+            name='card_last_four_snapshot',
+            field=models.CharField(blank=True, max_length=4, null=True),
+        ),
+        migrations.RunPython(backfill_card_snapshot, migrations.RunPython.noop),
+    ]
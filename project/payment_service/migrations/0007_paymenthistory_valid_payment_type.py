@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-16 19:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_service', '0006_paymenthistory_card_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='paymenthistory',
+            constraint=models.CheckConstraint(condition=models.Q(('payment_type__in', ['one_time', 'recurring'])), name='ph_valid_payment_type'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-16 19:46
+
+from django.db import migrations, models
+
+
+def clear_empty_json(apps, schema_editor):
+    for model_name, fields in (
+        ('PaymentHistory', ('metadata', 'raw_json', 'schedule_settings')),
+        ('TransactionToken', ('billing_data', 'raw_token_data')),
+    ):
+        model = apps.get_model('payment_service', model_name)
+        for field in fields:
+            model.objects.filter(**{field: {}}).update(**{field: None})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_service', '0007_paymenthistory_valid_payment_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymenthistory',
+            name='metadata',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='paymenthistory',
+            name='raw_json',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='paymenthistory',
+            name='schedule_settings',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transactiontoken',
+            name='billing_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transactiontoken',
+            name='raw_token_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(clear_empty_json, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,22 @@
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Now
 from django.conf import settings
 from django.core.validators import MinValueValidator
 
 
+def empty_json_as_null(values, fields):
+    """
+    Replace ``{}`` with None for the JSON ``fields`` in a dict of column
+    values. Queryset ``.update()`` calls skip save(), so they pass their
+    values through this to store empty payloads the same way.
+    """
+    for field in fields:
+        if values.get(field) == {}:
+            values[field] = None
+    return values
+
+
 class SubscriptionPlan(models.Model):
     PERIOD_CHOICES = [
         ('daily', 'Daily'),
@@ -20,7 +34,7 @@ class SubscriptionPlan(models.Model):
     currency = models.CharField(max_length=3, default='JPY')
     period = models.CharField(max_length=20, choices=PERIOD_CHOICES)
     is_active = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
@@ -42,9 +56,11 @@ class TransactionToken(models.Model):
         ('konbini', 'Convenience Store'),
         ('bank_transfer', 'Bank Transfer'),
     ]
+
+    OPTIONAL_JSON_FIELDS = ('billing_data', 'raw_token_data')
     
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='transaction_tokens')
-    univapay_token_id = models.UUIDField(unique=True, db_index=True)
+    univapay_token_id = models.UUIDField(unique=True)
     token_type = models.CharField(max_length=20, choices=TOKEN_TYPE_CHOICES)
     payment_type = models.CharField(max_length=20, choices=PAYMENT_TYPE_CHOICES, default='card')
     
@@ -62,7 +78,7 @@ class TransactionToken(models.Model):
     card_issuer = models.CharField(max_length=100, null=True, blank=True)
     
     # Billing information
-    billing_data = models.JSONField(default=dict, blank=True)  # Full billing address data
+    billing_data = models.JSONField(null=True, blank=True)  # Full billing address data
     
     # CVV authorization status (for recurring tokens)
     cvv_authorize_enabled = models.BooleanField(default=False)
@@ -78,19 +94,27 @@ class TransactionToken(models.Model):
     mode = models.CharField(max_length=10, default='test')  # test or live
     
     # Raw response from UnivaPay when token was created
-    raw_token_data = models.JSONField(default=dict, blank=True)
+    raw_token_data = models.JSONField(null=True, blank=True)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
     updated_at = models.DateTimeField(auto_now=True)
     last_used_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         indexes = [
-            models.Index(fields=['univapay_token_id']),
-            models.Index(fields=['user', 'is_active']),
+            # Only live tokens are looked up per user; inactive ones stay out of the index
+            models.Index(fields=['user'], condition=Q(is_active=True), name='txntoken_user_active_partial'),
             models.Index(fields=['user', 'token_type']),
         ]
         
+    def save(self, *args, **kwargs):
+        # Empty payloads are stored as NULL rather than '{}'. Other falsy
+        # JSON values ([], 0, false, "") are real data and are kept.
+        for field in self.OPTIONAL_JSON_FIELDS:
+            if getattr(self, field) == {}:
+                setattr(self, field, None)
+        super(TransactionToken, self).save(*args, **kwargs)
+
     def __str__(self):
         if self.card_brand and self.card_last_four:
             return f"{self.user} - {self.card_brand} ****{self.card_last_four}"
@@ -126,6 +150,9 @@ class PaymentHistory(models.Model):
         ('completed', 'Completed'),
     ]
 
+    ONETIME_STATUS_MAP = dict(ONETIME_STATUS_CHOICES)
+    RECURRING_STATUS_MAP = dict(RECURRING_STATUS_CHOICES)
+
     # Period choices for recurring payments
     PERIOD_CHOICES = [
         ('daily', 'Daily'),
@@ -152,6 +179,8 @@ class PaymentHistory(models.Model):
         ('skip', 'Skip'),
     ]
 
+    OPTIONAL_JSON_FIELDS = ('metadata', 'raw_json', 'schedule_settings')
+
     # Common fields for both payment types
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='payment_history')
     payment_type = models.CharField(max_length=10, choices=PAYMENT_TYPE_CHOICES)
@@ -164,6 +193,9 @@ class PaymentHistory(models.Model):
         blank=True,
         related_name='payments'
     )
+    # Card shown on the token when the payment was made, copied so lists need no join
+    card_brand_snapshot = models.CharField(max_length=50, null=True, blank=True)
+    card_last_four_snapshot = models.CharField(max_length=4, null=True, blank=True)
     
     # UnivaPay IDs - CORRECTED to be nullable
     univapay_id = models.UUIDField(null=True, blank=True, db_index=True)
@@ -174,12 +206,12 @@ class PaymentHistory(models.Model):
     currency = models.CharField(max_length=3)
     amount_formatted = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     only_direct_currency = models.BooleanField(default=False)
-    metadata = models.JSONField(default=dict)
+    metadata = models.JSONField(null=True, blank=True)
     mode = models.CharField(max_length=10)  # test or live
     created_on = models.DateTimeField(null=True, blank=True)  # CORRECTED to be nullable
     
     # Raw JSON response - ADDED (was missing)
-    raw_json = models.JSONField(default=dict, blank=True)
+    raw_json = models.JSONField(null=True, blank=True)
 
     # Status field - will be interpreted based on payment_type
     status = models.CharField(max_length=20)
@@ -245,7 +277,7 @@ class PaymentHistory(models.Model):
         max_digits=12, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(0)]
     )
     subsequent_cycles_start = models.DateField(null=True, blank=True)
-    schedule_settings = models.JSONField(default=dict, null=True, blank=True)  # Store all schedule settings as JSON
+    schedule_settings = models.JSONField(null=True, blank=True)  # Store all schedule settings as JSON
     first_charge_capture_after = models.DurationField(null=True, blank=True)
     first_charge_authorization_only = models.BooleanField(default=False)
     cyclical_period = models.CharField(max_length=20, null=True, blank=True)
@@ -275,18 +307,34 @@ class PaymentHistory(models.Model):
     retry_interval = models.CharField(max_length=20, null=True, blank=True)
 
     # Timestamps
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(db_default=Now(), editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Payment Histories"
         indexes = [
-            models.Index(fields=['univapay_id']),
             models.Index(fields=['user', 'created_at']),
             models.Index(fields=['payment_type', 'status']),
-            models.Index(fields=['transaction_token', 'created_at']),  # ADDED index
+            # Status sits before the sort column so filtered token pages come back in index order
+            models.Index(fields=['transaction_token', 'status', '-created_at'], name='pmt_txn_status_created_idx'),
+            # Admin date_hierarchy drill-down combined with the status filter
+            models.Index(fields=['-created_at', 'status'], name='ph_created_status_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(payment_type__in=['one_time', 'recurring']),
+                name='ph_valid_payment_type',
+            ),
         ]
 
+    def save(self, *args, **kwargs):
+        # Empty payloads are stored as NULL rather than '{}'. Other falsy
+        # JSON values ([], 0, false, "") are real data and are kept.
+        for field in self.OPTIONAL_JSON_FIELDS:
+            if getattr(self, field) == {}:
+                setattr(self, field, None)
+        super(PaymentHistory, self).save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.user} - {self.payment_type} - {self.amount} {self.currency} - {self.status}"
 
@@ -307,11 +355,5 @@ class PaymentHistory(models.Model):
 
     def get_status_display(self):
         if self.is_one_time_payment():
-            for code, name in self.ONETIME_STATUS_CHOICES:
-                if code == self.status:
-                    return name
-        else:
-            for code, name in self.RECURRING_STATUS_CHOICES:
-                if code == self.status:
-                    return name
-        return self.status
\ No newline at end of file
+            return self.ONETIME_STATUS_MAP.get(self.status, self.status)
+        return self.RECURRING_STATUS_MAP.get(self.status, self.status)
\ No newline at end of file
@@ -0,0 +1,37 @@
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+
+UNFILTERED_COUNT_CACHE_TIMEOUT = 60
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that caches the row count of unfiltered querysets.
+
+    Counting a whole table is the slow case, and a total that is up to a
+    minute old is fine for the admin listing. Filtered querysets, such as
+    one user's history, are counted through their index as usual.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+        # An empty WHERE means the count is the same for every user, so the
+        # entry can be shared. The key hashes the SQL rather than naming the
+        # table, so querysets that differ in joins, DISTINCT or slicing
+        # never share a total.
+        sql = hashlib.md5(str(query).encode()).hexdigest()
+        return cache.get_or_set(
+            f"paginator:count:{query.model._meta.db_table}:{sql}",
+            self.object_list.count,
+            UNFILTERED_COUNT_CACHE_TIMEOUT
+        )
+
+
+class CachedCountPagination(PageNumberPagination):
+    django_paginator_class = CachedCountPaginator
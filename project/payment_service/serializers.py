@@ -1,10 +1,66 @@
+import logging
+from collections.abc import Mapping
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.core.validators import MinValueValidator
 from .models import SubscriptionPlan, TransactionToken, PaymentHistory
 
+logger = logging.getLogger(__name__)
+
 User = get_user_model()
 
+# Columns read by PaymentHistoryListSerializer; the JSON payloads are left to the detail view
+PAYMENT_HISTORY_LIST_FIELDS = (
+    'id', 'user__email', 'payment_type', 'amount', 'currency', 'status', 'mode',
+    'univapay_id', 'store_id', 'created_at', 'updated_at',
+    'charged_amount', 'charged_currency', 'fee_amount', 'fee_currency',
+    'subscription_plan', 'period', 'cyclical_period', 'initial_amount', 'initial_amount_formatted',
+    'transaction_token', 'card_last_four_snapshot', 'card_brand_snapshot',
+    'next_payment_due_date', 'next_payment_amount', 'next_payment_currency',
+    'next_payment_is_paid', 'next_payment_is_last_payment',
+    'cancelled_on', 'termination_mode', 'error_code', 'error_message', 'error_detail',
+    'redirect_endpoint', 'three_ds_redirect_endpoint', 'three_ds_mode',
+)
+
+# Columns returned for saved payment methods; the detail view adds raw_token_data
+TRANSACTION_TOKEN_LIST_FIELDS = (
+    'id', 'user', 'univapay_token_id', 'token_type', 'payment_type', 'email',
+    'card_last_four', 'card_brand', 'card_exp_month', 'card_exp_year', 'card_bin',
+    'card_type', 'card_category', 'card_issuer', 'billing_data',
+    'cvv_authorize_enabled', 'cvv_authorize_status', 'three_ds_enabled', 'three_ds_status',
+    'is_active', 'usage_limit', 'mode', 'created_at', 'updated_at', 'last_used_at',
+)
+
+
+# Currencies without a minor unit are shown without decimals
+ZERO_DECIMAL_CURRENCIES = frozenset({'JPY', 'KRW', 'VND'})
+
+
+def format_amount(amount, currency):
+    """Render an amount with its currency, e.g. "¥18,000", "KRW 5,000" or "USD 12.50"."""
+    if not amount or not currency:
+        return None
+    if currency == 'JPY':
+        return f"¥{amount:,.0f}"
+    if currency in ZERO_DECIMAL_CURRENCIES:
+        return f"{currency} {amount:,.0f}"
+    return f"{currency} {amount:,.2f}"
+
+
+class FormattedAmountField(serializers.ReadOnlyField):
+    """Read-only string built from an amount column and its currency column."""
+
+    def __init__(self, amount_field, currency_field, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+        self.amount_field = amount_field
+        self.currency_field = currency_field
+
+    def to_representation(self, instance):
+        return format_amount(
+            getattr(instance, self.amount_field), getattr(instance, self.currency_field)
+        )
+
 
 class UserSerializer(serializers.ModelSerializer):
     full_name = serializers.CharField(source='profile.full_name', read_only=True)
@@ -17,27 +73,55 @@ class UserSerializer(serializers.ModelSerializer):
 class SubscriptionPlanSerializer(serializers.ModelSerializer):
     class Meta:
         model = SubscriptionPlan
-        fields = '__all__'
+        fields = (
+            'id', 'name', 'amount', 'currency', 'period', 'is_active',
+            'created_at', 'updated_at'
+        )
         read_only_fields = ('created_at', 'updated_at')
 
 
+class TransactionTokenListSerializer(serializers.ModelSerializer):
+    """Saved payment methods without the raw Univapay payload"""
+    user = UserSerializer(read_only=True)
+
+    class Meta:
+        model = TransactionToken
+        fields = TRANSACTION_TOKEN_LIST_FIELDS
+        read_only_fields = fields
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Empty payloads are stored as NULL; clients keep getting an object
+        if data.get('billing_data') is None:
+            data['billing_data'] = {}
+        return data
+
+
 class TransactionTokenSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
         model = TransactionToken
-        fields = '__all__'
+        fields = TRANSACTION_TOKEN_LIST_FIELDS + ('raw_token_data',)
         read_only_fields = (
             'user', 'created_at', 'updated_at', 'last_used_at'
         )
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Empty payloads are stored as NULL; clients keep getting an object
+        for field in TransactionToken.OPTIONAL_JSON_FIELDS:
+            if data.get(field) is None:
+                data[field] = {}
+        return data
+
 
 class CreateTransactionTokenSerializer(serializers.Serializer):
     """Serializer for creating/storing transaction tokens from frontend"""
     token_id = serializers.UUIDField()
-    token_type = serializers.ChoiceField(choices=['one_time', 'subscription', 'recurring'])
+    token_type = serializers.ChoiceField(choices=TransactionToken.TOKEN_TYPE_CHOICES)
     payment_type = serializers.ChoiceField(
-        choices=['card', 'paidy', 'online', 'konbini', 'bank_transfer'],
+        choices=TransactionToken.PAYMENT_TYPE_CHOICES,
         default='card'
     )
     email = serializers.EmailField()
@@ -65,6 +149,20 @@ class CreateTransactionTokenSerializer(serializers.Serializer):
     # Raw token data from UnivaPay
     raw_token_data = serializers.JSONField(required=False, default=dict)
 
+    def to_internal_value(self, data):
+        # Card details are ignored for other payment types, so skip validating them
+        if (isinstance(data, Mapping) and 'card_details' in data
+                and data.get('payment_type', 'card') != 'card'):
+            data = {key: value for key, value in data.items() if key != 'card_details'}
+        return super().to_internal_value(data)
+
+    def validate(self, data):
+        if data['payment_type'] == 'card' and not data.get('card_details'):
+            raise serializers.ValidationError({
+                'card_details': 'This field is required for card payments.'
+            })
+        return data
+
 
 class RedirectSerializer(serializers.Serializer):
     endpoint = serializers.URLField(required=False, allow_null=True)
@@ -72,7 +170,7 @@ class RedirectSerializer(serializers.Serializer):
 
 class ThreeDSSerializer(serializers.Serializer):
     mode = serializers.ChoiceField(
-        choices=[('normal', 'Normal'), ('require', 'Require'), ('force', 'Force'), ('skip', 'Skip')],
+        choices=PaymentHistory.THREE_DS_MODE_CHOICES,
         default='normal',
         required=False
     )
@@ -84,7 +182,7 @@ class ScheduleSettingsSerializer(serializers.Serializer):
     preserve_end_of_month = serializers.BooleanField(required=False, allow_null=True)
     retry_interval = serializers.CharField(required=False, allow_null=True)
     termination_mode = serializers.ChoiceField(
-        choices=[('immediate', 'Immediate'), ('on_next_payment', 'On Next Payment')],
+        choices=PaymentHistory.TERMINATION_MODE_CHOICES,
         default='immediate',
         required=False
     )
@@ -104,10 +202,8 @@ class UnivapayChargeSerializer(serializers.Serializer):
     three_ds = ThreeDSSerializer(required=False)
     
     def validate(self, data):
-        print(f"[DEBUG] UnivapayChargeSerializer.validate - Input data: {data}")
-        validated_data = super().validate(data)
-        print(f"[DEBUG] UnivapayChargeSerializer.validate - Validated data: {validated_data}")
-        return validated_data
+        logger.debug("UnivapayChargeSerializer.validate - Input data: %s", data)
+        return super().validate(data)
 
 
 class UnivapaySubscriptionSerializer(serializers.Serializer):
@@ -126,10 +222,8 @@ class UnivapaySubscriptionSerializer(serializers.Serializer):
     three_ds = ThreeDSSerializer(required=False)
     
     def validate(self, data):
-        print(f"[DEBUG] UnivapaySubscriptionSerializer.validate - Input data: {data}")
-        validated_data = super().validate(data)
-        print(f"[DEBUG] UnivapaySubscriptionSerializer.validate - Validated data: {validated_data}")
-        return validated_data
+        logger.debug("UnivapaySubscriptionSerializer.validate - Input data: %s", data)
+        return super().validate(data)
 
 
 class PaymentHistorySerializer(serializers.ModelSerializer):
@@ -141,12 +235,50 @@ class PaymentHistorySerializer(serializers.ModelSerializer):
     
     class Meta:
         model = PaymentHistory
-        fields = '__all__'
+        fields = (
+            'id', 'user', 'subscription_plan', 'transaction_token', 'status_display', 'is_successful',
+            'payment_type', 'card_brand_snapshot', 'card_last_four_snapshot',
+            'univapay_id', 'store_id', 'univapay_transaction_token_id',
+            'amount', 'currency', 'amount_formatted', 'only_direct_currency', 'metadata', 'mode',
+            'created_on', 'raw_json', 'status', 'transaction_token_type', 'subscription_id',
+            'merchant_transaction_id',
+            'requested_amount', 'requested_currency', 'requested_amount_formatted',
+            'charged_amount', 'charged_currency', 'charged_amount_formatted',
+            'fee_amount', 'fee_currency', 'fee_amount_formatted',
+            'capture_at', 'descriptor', 'descriptor_phone_number',
+            'error_code', 'error_message', 'error_detail',
+            'redirect_endpoint', 'redirect_id', 'three_ds_redirect_endpoint', 'three_ds_redirect_id',
+            'three_ds_mode', 'bank_ledger_type', 'balance',
+            'virtual_bank_account_holder_name', 'virtual_bank_account_number', 'virtual_account_id',
+            'transaction_date', 'transaction_timestamp', 'transaction_id',
+            'period', 'initial_amount', 'initial_amount_formatted', 'subsequent_cycles_start',
+            'schedule_settings', 'first_charge_capture_after', 'first_charge_authorization_only',
+            'cyclical_period', 'next_payment_id', 'next_payment_due_date', 'next_payment_zone_id',
+            'next_payment_amount', 'next_payment_currency', 'next_payment_amount_formatted',
+            'next_payment_is_paid', 'next_payment_is_last_payment',
+            'next_payment_created_on', 'next_payment_updated_on', 'next_payment_retry_date',
+            'cancelled_on', 'termination_mode', 'retry_interval', 'created_at', 'updated_at',
+        )
         read_only_fields = (
             'created_at', 'updated_at', 'univapay_id', 'store_id',
             'transaction_token_id', 'created_on'
         )
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join everything the nested serializers read, including both profiles."""
+        return queryset.select_related(
+            'user__profile', 'subscription_plan', 'transaction_token__user__profile'
+        )
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Empty payloads are stored as NULL; clients keep getting an object
+        for field in PaymentHistory.OPTIONAL_JSON_FIELDS:
+            if data.get(field) is None:
+                data[field] = {}
+        return data
+
 
 class PaymentHistoryListSerializer(serializers.ModelSerializer):
     """Comprehensive serializer for list views with all necessary fields"""
@@ -159,13 +291,13 @@ class PaymentHistoryListSerializer(serializers.ModelSerializer):
     subscription_plan_description = serializers.CharField(source='subscription_plan.description', read_only=True)
     
     # Transaction token details
-    transaction_token_last_four = serializers.CharField(source='transaction_token.card_last_four', read_only=True)
-    transaction_token_brand = serializers.CharField(source='transaction_token.card_brand', read_only=True)
+    transaction_token_last_four = serializers.CharField(source='card_last_four_snapshot', read_only=True)
+    transaction_token_brand = serializers.CharField(source='card_brand_snapshot', read_only=True)
     
     # Formatted amounts
-    amount_formatted = serializers.SerializerMethodField()
-    charged_amount_formatted = serializers.SerializerMethodField()
-    fee_amount_formatted = serializers.SerializerMethodField()
+    amount_formatted = FormattedAmountField('amount', 'currency')
+    charged_amount_formatted = FormattedAmountField('charged_amount', 'charged_currency')
+    fee_amount_formatted = FormattedAmountField('fee_amount', 'fee_currency')
     
     # Next payment info for subscriptions
     next_payment_due_date = serializers.DateField(read_only=True)
@@ -207,47 +339,19 @@ class PaymentHistoryListSerializer(serializers.ModelSerializer):
             
             # Redirect/3DS info
             'redirect_endpoint', 'three_ds_redirect_endpoint', 'three_ds_mode',
-            
-            # Additional metadata
-            'metadata', 'raw_json'
         ]
         read_only_fields = fields
-    
-    def get_amount_formatted(self, obj):
-        """Format amount with currency"""
-        if obj.amount and obj.currency:
-            try:
-                if obj.currency == 'JPY':
-                    return f"¥{obj.amount:,.0f}"
-                else:
-                    return f"{obj.currency} {obj.amount:,.2f}"
-            except:
-                return str(obj.amount)
-        return None
-    
-    def get_charged_amount_formatted(self, obj):
-        """Format charged amount with currency"""
-        if obj.charged_amount and obj.charged_currency:
-            try:
-                if obj.charged_currency == 'JPY':
-                    return f"¥{obj.charged_amount:,.0f}"
-                else:
-                    return f"{obj.charged_currency} {obj.charged_amount:,.2f}"
-            except:
-                return str(obj.charged_amount)
-        return None
-    
-    def get_fee_amount_formatted(self, obj):
-        """Format fee amount with currency"""
-        if obj.fee_amount and obj.fee_currency:
-            try:
-                if obj.fee_currency == 'JPY':
-                    return f"¥{obj.fee_amount:,.0f}"
-                else:
-                    return f"{obj.fee_currency} {obj.fee_amount:,.2f}"
-            except:
-                return str(obj.fee_amount)
-        return None
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join the user and plan, and select only the columns listed above."""
+        return queryset.select_related(
+            'user', 'subscription_plan'
+        ).only(*PAYMENT_HISTORY_LIST_FIELDS)
+
+
+# A webhook payload must carry at least one of these keys
+WEBHOOK_EVENT_KEYS = frozenset({'event', 'type', 'status', 'id'})
 
 
 class WebhookEventSerializer(serializers.Serializer):
@@ -262,13 +366,11 @@ class WebhookEventSerializer(serializers.Serializer):
     subscription = serializers.JSONField(required=False, default=dict)
     
     def validate(self, data):
-        print(f"[DEBUG] WebhookEventSerializer.validate - Input data: {data}")
-        if not any(key in data for key in ['event', 'type', 'status', 'id']):
-            print(f"[DEBUG] WebhookEventSerializer.validate - Validation error: Missing required fields")
+        logger.debug("WebhookEventSerializer.validate - Input data: %s", data)
+        if WEBHOOK_EVENT_KEYS.isdisjoint(data):
             raise serializers.ValidationError(
                 "At least one of 'event', 'type', 'status', or 'id' is required."
             )
-        print(f"[DEBUG] WebhookEventSerializer.validate - Validation successful")
         return data
 
 
@@ -297,7 +399,7 @@ class CancelSubscriptionSerializer(serializers.Serializer):
     """Serializer for cancelling a subscription"""
     subscription_id = serializers.UUIDField(required=False, allow_null=True)
     termination_mode = serializers.ChoiceField(
-        choices=[('immediate', 'Immediate'), ('on_next_payment', 'On Next Payment')],
+        choices=PaymentHistory.TERMINATION_MODE_CHOICES,
         default='immediate'
     )
     reason = serializers.CharField(max_length=500, required=False, allow_blank=True)
@@ -323,10 +425,8 @@ class PurchaseSerializer(serializers.Serializer):
     amount = serializers.IntegerField(min_value=1)
     
     def validate(self, data):
-        print(f"[DEBUG] PurchaseSerializer.validate - Input data: {data}")
-        validated_data = super().validate(data)
-        print(f"[DEBUG] PurchaseSerializer.validate - Validated data: {validated_data}")
-        return validated_data
+        logger.debug("PurchaseSerializer.validate - Input data: %s", data)
+        return super().validate(data)
 
 
 class SubscribeSerializer(serializers.Serializer):
@@ -334,7 +434,5 @@ class SubscribeSerializer(serializers.Serializer):
     plan = serializers.PrimaryKeyRelatedField(queryset=SubscriptionPlan.objects.all())
     
     def validate(self, data):
-        print(f"[DEBUG] SubscribeSerializer.validate - Input data: {data}")
-        validated_data = super().validate(data)
-        print(f"[DEBUG] SubscribeSerializer.validate - Validated data: {validated_data}")
-        return validated_data
+        logger.debug("SubscribeSerializer.validate - Input data: %s", data)
+        return super().validate(data)
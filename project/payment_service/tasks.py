@@ -0,0 +1,130 @@
+from celery import shared_task
+
+from .models import PaymentHistory
+from .univapay_client import UnivapayError, get_univapay_client
+from .utils import parse_datetime
+
+POLL_RETRY_AFTER_SECONDS = 60
+
+
+@shared_task(ignore_result=True, autoretry_for=(UnivapayError,), retry_backoff=True, max_retries=3)
+def poll_provider_status(kind, provider_id, retry=False):
+    """
+    One-off refresh of a payment's status from Univapay, as a fallback
+    in case the webhook never arrives.
+    kind: 'charge' | 'subscription'
+    provider_id: PaymentHistory.id
+    retry: whether this is the second attempt
+    """
+    try:
+        payment = PaymentHistory.objects.get(id=provider_id)
+    except PaymentHistory.DoesNotExist:
+        return
+
+    univapay = get_univapay_client()
+
+    if kind == "charge" and payment.univapay_id:
+        data = univapay.get_charge(payment.univapay_id)
+    elif kind == "subscription" and payment.univapay_id:
+        data = univapay.get_subscription(payment.univapay_id)
+    else:
+        return
+
+    status_val = (data or {}).get("status")
+    if status_val:
+        payment.status = status_val
+
+        # Update other fields that might have changed
+        update_fields = ['status', 'updated_at']
+
+        if kind == "charge":
+            # Update charge-specific fields
+            if data.get('charged_amount') is not None:
+                payment.charged_amount = data.get('charged_amount')
+                update_fields.append('charged_amount')
+            if data.get('charged_currency'):
+                payment.charged_currency = data.get('charged_currency')
+                update_fields.append('charged_currency')
+            if data.get('charged_amount_formatted') is not None:
+                payment.charged_amount_formatted = data.get('charged_amount_formatted')
+                update_fields.append('charged_amount_formatted')
+            if data.get('fee_amount') is not None:
+                payment.fee_amount = data.get('fee_amount')
+                update_fields.append('fee_amount')
+            if data.get('fee_currency'):
+                payment.fee_currency = data.get('fee_currency')
+                update_fields.append('fee_currency')
+            if data.get('fee_amount_formatted') is not None:
+                payment.fee_amount_formatted = data.get('fee_amount_formatted')
+                update_fields.append('fee_amount_formatted')
+
+            # Update the main amount field if charged_amount is available
+            if data.get('charged_amount') is not None:
+                payment.amount = data.get('charged_amount')
+                update_fields.append('amount')
+            if data.get('charged_currency'):
+                payment.currency = data.get('charged_currency')
+                update_fields.append('currency')
+
+        elif kind == "subscription":
+            # Update subscription-specific fields
+            if data.get('amount') is not None:
+                payment.amount = data.get('amount')
+                update_fields.append('amount')
+            if data.get('currency'):
+                payment.currency = data.get('currency')
+                update_fields.append('currency')
+            if data.get('amount_formatted') is not None:
+                payment.amount_formatted = data.get('amount_formatted')
+                update_fields.append('amount_formatted')
+            if data.get('period'):
+                payment.period = data.get('period')
+                update_fields.append('period')
+            if data.get('cyclical_period'):
+                payment.cyclical_period = data.get('cyclical_period')
+                update_fields.append('cyclical_period')
+
+            # Update next payment details
+            next_payment = data.get('next_payment', {})
+            if next_payment:
+                if next_payment.get('id'):
+                    payment.next_payment_id = next_payment.get('id')
+                    update_fields.append('next_payment_id')
+                if next_payment.get('due_date'):
+                    payment.next_payment_due_date = next_payment.get('due_date')
+                    update_fields.append('next_payment_due_date')
+                if next_payment.get('zone_id'):
+                    payment.next_payment_zone_id = next_payment.get('zone_id')
+                    update_fields.append('next_payment_zone_id')
+                if next_payment.get('amount') is not None:
+                    payment.next_payment_amount = next_payment.get('amount')
+                    update_fields.append('next_payment_amount')
+                if next_payment.get('currency'):
+                    payment.next_payment_currency = next_payment.get('currency')
+                    update_fields.append('next_payment_currency')
+                if next_payment.get('amount_formatted') is not None:
+                    payment.next_payment_amount_formatted = next_payment.get('amount_formatted')
+                    update_fields.append('next_payment_amount_formatted')
+                if next_payment.get('is_paid') is not None:
+                    payment.next_payment_is_paid = next_payment.get('is_paid')
+                    update_fields.append('next_payment_is_paid')
+                if next_payment.get('is_last_payment') is not None:
+                    payment.next_payment_is_last_payment = next_payment.get('is_last_payment')
+                    update_fields.append('next_payment_is_last_payment')
+                if next_payment.get('created_on'):
+                    payment.next_payment_created_on = parse_datetime(next_payment.get('created_on'))
+                    update_fields.append('next_payment_created_on')
+                if next_payment.get('updated_on'):
+                    payment.next_payment_updated_on = parse_datetime(next_payment.get('updated_on'))
+                    update_fields.append('next_payment_updated_on')
+                if next_payment.get('retry_date'):
+                    payment.next_payment_retry_date = next_payment.get('retry_date')
+                    update_fields.append('next_payment_retry_date')
+
+        payment.save(update_fields=update_fields)
+
+        # Optional: second attempt if still "pending/awaiting" for charges
+        if not retry and kind == "charge" and status_val in ("pending", "awaiting"):
+            poll_provider_status.apply_async(
+                args=[kind, provider_id, True], countdown=POLL_RETRY_AFTER_SECONDS
+            )
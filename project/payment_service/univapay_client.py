@@ -1,7 +1,10 @@
 import uuid
 import requests
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Load .env file
 load_dotenv()
@@ -12,6 +15,9 @@ UNIVAPAY_WEBHOOK_AUTH = os.getenv('UNIVAPAY_WEBHOOK_AUTH', '')
 UNIVAPAY_STORE_ID = os.getenv('UNIVAPAY_STORE_ID', '')
 UNIVAPAY_BASE_URL = os.getenv('UNIVAPAY_BASE_URL', 'https://api.univapay.com')
 
+# (connect, read) timeout in seconds for every Univapay call
+UNIVAPAY_TIMEOUT = (3.05, 10)
+
 
 class UnivapayError(Exception):
     def __init__(self, status, body):
@@ -36,29 +42,39 @@ class UnivapayClient:
             'Content-Type': 'application/json',
         }
 
+        # Pooled session carrying the static headers, so calls reuse open
+        # TLS connections. Gateway errors are retried for idempotent
+        # methods only; a POST is never resent automatically.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=50,
+            max_retries=Retry(
+                total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504], raise_on_status=False
+            ),
+        ))
+
     @staticmethod
     def new_idempotency_key():
         return str(uuid.uuid4())
 
     def _request(self, method, endpoint, data=None, idempotency_key=None):
         url = f"{self.base_url}{endpoint}"
-        headers = self.headers.copy()
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else None
 
-        if idempotency_key:
-            headers['Idempotency-Key'] = idempotency_key
+        method = method.upper()
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+            raise ValueError(f"Unsupported HTTP method: {method}")
 
         try:
-            if method.upper() == 'GET':
-                response = requests.get(url, headers=headers, params=data)
-            elif method.upper() == 'POST':
-                response = requests.post(url, headers=headers, json=data)
-            elif method.upper() == 'PUT':
-                response = requests.put(url, headers=headers, json=data)
-            elif method.upper() == 'DELETE':
-                response = requests.delete(url, headers=headers)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
-
+            response = self.session.request(
+                method, url,
+                headers=headers,
+                params=data if method == 'GET' else None,
+                json=data if method in ('POST', 'PUT') else None,
+                timeout=UNIVAPAY_TIMEOUT,
+            )
 
             if response.status_code >= 400:
                 raise UnivapayError(response.status_code, response.text)
@@ -175,4 +191,10 @@ class UnivapayClient:
         if metadata:
             data["metadata"] = metadata
         
-        return self._request('POST', endpoint, data, idempotency_key)
\ No newline at end of file
+        return self._request('POST', endpoint, data, idempotency_key)
+
+
+@lru_cache(maxsize=None)
+def get_univapay_client():
+    """Return the process-wide client; the credentials are fixed at import time."""
+    return UnivapayClient()
@@ -0,0 +1,25 @@
+import logging
+from datetime import datetime
+
+from django.utils import timezone
+from django.utils.timezone import make_aware
+
+logger = logging.getLogger(__name__)
+
+
+def parse_datetime(dt_string):
+    """Parse datetime string from Univapay API responses."""
+    if not dt_string:
+        return None
+    try:
+        # Handle ISO format with Z timezone
+        if dt_string.endswith('Z'):
+            dt_string = dt_string.replace('Z', '+00:00')
+        # Parse and make timezone aware
+        dt = datetime.fromisoformat(dt_string)
+        if timezone.is_naive(dt):
+            dt = make_aware(dt)
+        return dt
+    except Exception as e:
+        logger.warning("Error parsing datetime %r: %s", dt_string, e)
+        return None
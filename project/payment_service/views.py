@@ -1,15 +1,14 @@
 import hashlib
 import hmac
 import json
+import logging
 import os
-import threading
-import time
 from datetime import datetime
 
 from django.conf import settings
 from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.utils.timezone import now, make_aware
 from django.views.decorators.csrf import csrf_exempt
@@ -20,7 +19,8 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import SubscriptionPlan, PaymentHistory, TransactionToken
+from .models import SubscriptionPlan, PaymentHistory, TransactionToken, empty_json_as_null
+from .pagination import CachedCountPagination
 from .serializers import (
     SubscriptionPlanSerializer,
     PurchaseSerializer,
@@ -32,13 +32,17 @@ from .serializers import (
     CancelSubscriptionSerializer,
     RefundChargeSerializer,
     PaymentStatusSerializer,
-    TransactionTokenSerializer
+    TransactionTokenSerializer,
+    TransactionTokenListSerializer
 )
-from .univapay_client import UnivapayClient, UnivapayError, UNIVAPAY_WEBHOOK_AUTH
+from .tasks import poll_provider_status
+from .univapay_client import UnivapayError, UNIVAPAY_WEBHOOK_AUTH, get_univapay_client
+from .utils import parse_datetime
+
+logger = logging.getLogger(__name__)
 
 # Constants
 POLL_AFTER_SECONDS = 30
-POLL_RETRY_AFTER_SECONDS = 60
 ENABLE_POLL_FALLBACK = True
 
 
@@ -80,153 +84,20 @@ def verify_webhook_signature(request):
     return hmac.compare_digest(signature, expected_signature)
 
 
-def parse_datetime(dt_string):
-    """Parse datetime string from Univapay API responses."""
-    if not dt_string:
-        return None
-    try:
-        # Handle ISO format with Z timezone
-        if dt_string.endswith('Z'):
-            dt_string = dt_string.replace('Z', '+00:00')
-        # Parse and make timezone aware
-        dt = datetime.fromisoformat(dt_string)
-        if timezone.is_naive(dt):
-            dt = make_aware(dt)
-        return dt
-    except Exception as e:
-        print(f"Error parsing datetime '{dt_string}': {e}")
-        return None
-
-
-def _poll_provider_status_later(kind, provider_id, delay_s, retry=False):
+def _poll_provider_status_later(kind, provider_id, delay_s):
     """
     Schedule a one-off background poll to refresh provider status.
     kind: 'charge' | 'subscription'
     provider_id: PaymentHistory.id
     delay_s: seconds to wait
-    retry: whether this is the second attempt
     """
     if not ENABLE_POLL_FALLBACK:
         return
 
-    def _task():
-        time.sleep(delay_s)
-        try:
-            payment = PaymentHistory.objects.get(id=provider_id)
-            univapay = UnivapayClient()
-
-            if kind == "charge" and payment.univapay_id:
-                data = univapay.get_charge(payment.univapay_id)
-            elif kind == "subscription" and payment.univapay_id:
-                data = univapay.get_subscription(payment.univapay_id)
-            else:
-                return
-
-            status_val = (data or {}).get("status")
-            if status_val:
-                old_status = payment.status
-                payment.status = status_val
-                
-                # Update other fields that might have changed
-                update_fields = ['status', 'updated_at']
-                
-                if kind == "charge":
-                    # Update charge-specific fields
-                    if data.get('charged_amount') is not None:
-                        payment.charged_amount = data.get('charged_amount')
-                        update_fields.append('charged_amount')
-                    if data.get('charged_currency'):
-                        payment.charged_currency = data.get('charged_currency')
-                        update_fields.append('charged_currency')
-                    if data.get('charged_amount_formatted') is not None:
-                        payment.charged_amount_formatted = data.get('charged_amount_formatted')
-                        update_fields.append('charged_amount_formatted')
-                    if data.get('fee_amount') is not None:
-                        payment.fee_amount = data.get('fee_amount')
-                        update_fields.append('fee_amount')
-                    if data.get('fee_currency'):
-                        payment.fee_currency = data.get('fee_currency')
-                        update_fields.append('fee_currency')
-                    if data.get('fee_amount_formatted') is not None:
-                        payment.fee_amount_formatted = data.get('fee_amount_formatted')
-                        update_fields.append('fee_amount_formatted')
-                    
-                    # Update the main amount field if charged_amount is available
-                    if data.get('charged_amount') is not None:
-                        payment.amount = data.get('charged_amount')
-                        update_fields.append('amount')
-                    if data.get('charged_currency'):
-                        payment.currency = data.get('charged_currency')
-                        update_fields.append('currency')
-                        
-                elif kind == "subscription":
-                    # Update subscription-specific fields
-                    if data.get('amount') is not None:
-                        payment.amount = data.get('amount')
-                        update_fields.append('amount')
-                    if data.get('currency'):
-                        payment.currency = data.get('currency')
-                        update_fields.append('currency')
-                    if data.get('amount_formatted') is not None:
-                        payment.amount_formatted = data.get('amount_formatted')
-                        update_fields.append('amount_formatted')
-                    if data.get('period'):
-                        payment.period = data.get('period')
-                        update_fields.append('period')
-                    if data.get('cyclical_period'):
-                        payment.cyclical_period = data.get('cyclical_period')
-                        update_fields.append('cyclical_period')
-                    
-                    # Update next payment details
-                    next_payment = data.get('next_payment', {})
-                    if next_payment:
-                        if next_payment.get('id'):
-                            payment.next_payment_id = next_payment.get('id')
-                            update_fields.append('next_payment_id')
-                        if next_payment.get('due_date'):
-                            payment.next_payment_due_date = next_payment.get('due_date')
-                            update_fields.append('next_payment_due_date')
-                        if next_payment.get('zone_id'):
-                            payment.next_payment_zone_id = next_payment.get('zone_id')
-                            update_fields.append('next_payment_zone_id')
-                        if next_payment.get('amount') is not None:
-                            payment.next_payment_amount = next_payment.get('amount')
-                            update_fields.append('next_payment_amount')
-                        if next_payment.get('currency'):
-                            payment.next_payment_currency = next_payment.get('currency')
-                            update_fields.append('next_payment_currency')
-                        if next_payment.get('amount_formatted') is not None:
-                            payment.next_payment_amount_formatted = next_payment.get('amount_formatted')
-                            update_fields.append('next_payment_amount_formatted')
-                        if next_payment.get('is_paid') is not None:
-                            payment.next_payment_is_paid = next_payment.get('is_paid')
-                            update_fields.append('next_payment_is_paid')
-                        if next_payment.get('is_last_payment') is not None:
-                            payment.next_payment_is_last_payment = next_payment.get('is_last_payment')
-                            update_fields.append('next_payment_is_last_payment')
-                        if next_payment.get('created_on'):
-                            payment.next_payment_created_on = parse_datetime(next_payment.get('created_on'))
-                            update_fields.append('next_payment_created_on')
-                        if next_payment.get('updated_on'):
-                            payment.next_payment_updated_on = parse_datetime(next_payment.get('updated_on'))
-                            update_fields.append('next_payment_updated_on')
-                        if next_payment.get('retry_date'):
-                            payment.next_payment_retry_date = next_payment.get('retry_date')
-                            update_fields.append('next_payment_retry_date')
-                
-                payment.save(update_fields=update_fields)
-
-                # Optional: second attempt if still "pending/awaiting" for charges
-                if not retry and kind == "charge" and status_val in ("pending", "awaiting"):
-                    _poll_provider_status_later(kind, provider_id, POLL_RETRY_AFTER_SECONDS, retry=True)
-
-        except Exception as e:
-            # Log error for monitoring purposes
-            pass
-
-    thread = threading.Thread(target=_task)
-    thread.daemon = True
-    thread.start()
+    # Queue it once the payment row is committed, so the worker can read it
+    transaction.on_commit(
+        lambda: poll_provider_status.apply_async(args=[kind, provider_id], countdown=delay_s)
+    )
 
 
 # Widget Configuration Endpoint
@@ -386,19 +257,18 @@ class PaymentHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = PaymentHistoryListSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CachedCountPagination
 
     def get_queryset(self):
+        query_set = self.get_serializer_class().setup_eager_loading(
+            PaymentHistory.objects.all()
+        )
+
         if self.request.user.kind in ['ADMIN', 'SUPER_ADMIN']:
-            query_set =  PaymentHistory.objects.filter().select_related(
-                'transaction_token',
-                'subscription_plan'
-            ).order_by('-created_at')
+            query_set = query_set.order_by('-created_at')
         elif self.request.user.kind == 'END_USER' :
-            query_set = PaymentHistory.objects.filter(
+            query_set = query_set.filter(
                 user=self.request.user
-            ).select_related(
-                'transaction_token',
-                'subscription_plan'
             ).order_by('-created_at')
         else:
             query_set = []
@@ -449,19 +319,12 @@ class PaymentHistoryViewSet(viewsets.ReadOnlyModelViewSet):
         """Get all subscription records for the user."""
 
         if self.request.user.kind in ['ADMIN', 'SUPER_ADMIN']:
-            subscriptions = PaymentHistory.objects.filter(
-                payment_type='recurring'
-            ).select_related(
-                'transaction_token',
-                'subscription_plan'
+            subscriptions = PaymentHistoryListSerializer.setup_eager_loading(
+                PaymentHistory.objects.filter(payment_type='recurring')
             ).order_by('-created_at')
         elif self.request.user.kind == 'END_USER':
-            subscriptions = PaymentHistory.objects.filter(
-                user=request.user,
-                payment_type='recurring'
-            ).select_related(
-                'transaction_token',
-                'subscription_plan'
+            subscriptions = PaymentHistoryListSerializer.setup_eager_loading(
+                PaymentHistory.objects.filter(user=request.user, payment_type='recurring')
             ).order_by('-created_at')
         else:
             subscriptions = []
@@ -481,7 +344,7 @@ class PaymentHistoryViewSet(viewsets.ReadOnlyModelViewSet):
         summary='List User Transaction Tokens',
         description='Retrieve all transaction tokens for the authenticated user.',
         responses={
-            200: TransactionTokenSerializer(many=True),
+            200: TransactionTokenListSerializer(many=True),
             401: {'description': 'Authentication required'}
         }
     ),
@@ -550,9 +413,17 @@ class TransactionTokenViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return TransactionToken.objects.filter(
+        query_set = TransactionToken.objects.filter(
             user=self.request.user
-        ).order_by('-created_at')
+        ).select_related('user__profile').order_by('-created_at')
+        if self.action == 'list':
+            query_set = query_set.defer('raw_token_data')
+        return query_set
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return TransactionTokenListSerializer
+        return TransactionTokenSerializer
 
     @extend_schema(
         tags=['Transaction Tokens'],
@@ -671,7 +542,7 @@ class TransactionTokenViewSet(viewsets.ModelViewSet):
                 # Check if token already exists
                 existing_token = TransactionToken.objects.filter(
                     univapay_token_id=token_id
-                ).first()
+                ).select_related('user__profile').first()
                 
                 if existing_token:
                     # Update last_used_at
@@ -839,10 +710,10 @@ class SubscribeView(APIView):
         
         serializer = SubscribeSerializer(data=request.data)
         if serializer.is_valid():
-            plan_id = serializer.validated_data['plan'].id
-
-            # Get the subscription plan
-            subscription_plan = get_object_or_404(SubscriptionPlan, id=plan_id, is_active=True)
+            # The serializer already loaded the plan; only inactive plans are refused here
+            subscription_plan = serializer.validated_data['plan']
+            if not subscription_plan.is_active:
+                raise Http404
 
             # Create a local subscription record
             payment = PaymentHistory.objects.create(
@@ -943,7 +814,7 @@ class UnivapayChargeView(APIView):
                     # Token doesn't exist in our DB, but we can still proceed with the charge
                     pass
                 
-                univapay = UnivapayClient()
+                univapay = get_univapay_client()
                 idem_key = univapay.new_idempotency_key()
 
                 # Create charge with Univapay
@@ -970,6 +841,8 @@ class UnivapayChargeView(APIView):
                     'user': request.user,
                     'payment_type': 'one_time',
                     'transaction_token': token_record,  # Link the token if it exists
+                    'card_brand_snapshot': token_record.card_brand if token_record else None,
+                    'card_last_four_snapshot': token_record.card_last_four if token_record else None,
                     'univapay_id': resp.get('id'),
                     'store_id': resp.get('store_id'),
                     'univapay_transaction_token_id': resp.get('transaction_token_id'),
@@ -1158,7 +1031,7 @@ class UnivapaySubscriptionView(APIView):
                     # Token doesn't exist in our DB, but we can still proceed
                     pass
                 
-                univapay = UnivapayClient()
+                univapay = get_univapay_client()
                 idem_key = univapay.new_idempotency_key()
 
                 # Create subscription with Univapay
@@ -1186,6 +1059,8 @@ class UnivapaySubscriptionView(APIView):
                     'user': request.user,
                     'payment_type': 'recurring',
                     'transaction_token': token_record,  # Link the token if it exists
+                    'card_brand_snapshot': token_record.card_brand if token_record else None,
+                    'card_last_four_snapshot': token_record.card_last_four if token_record else None,
                     'univapay_id': resp.get('id'),
                     'store_id': resp.get('store_id'),
                     'univapay_transaction_token_id': resp.get('transaction_token_id'),
@@ -1399,10 +1274,12 @@ class CancelSubscriptionView(APIView):
                     pass
                 
                 # Verify the subscription belongs to the user
-                payment = PaymentHistory.objects.filter(
-                    univapay_id=subscription_id,
-                    user=request.user,
-                    payment_type='recurring'
+                payment = PaymentHistorySerializer.setup_eager_loading(
+                    PaymentHistory.objects.filter(
+                        univapay_id=subscription_id,
+                        user=request.user,
+                        payment_type='recurring'
+                    )
                 ).first()
                 
                 if not payment:
@@ -1412,7 +1289,7 @@ class CancelSubscriptionView(APIView):
                         'subscription_id': str(subscription_id)
                     }, status=status.HTTP_404_NOT_FOUND)
                 
-                univapay = UnivapayClient()
+                univapay = get_univapay_client()
 
                 # Cancel subscription with Univapay
                 resp = univapay.cancel_subscription(
@@ -1494,7 +1371,7 @@ class RefundChargeView(APIView):
                 reason = serializer.validated_data.get('reason', '')
                 metadata = serializer.validated_data.get('metadata', {})
 
-                univapay = UnivapayClient()
+                univapay = get_univapay_client()
                 idem_key = univapay.new_idempotency_key()
 
                 # Refund charge with Univapay
@@ -1556,7 +1433,7 @@ class PaymentStatusView(APIView):
                 payment_id = serializer.validated_data['payment_id']
                 payment_type = serializer.validated_data['payment_type']
 
-                univapay = UnivapayClient()
+                univapay = get_univapay_client()
 
                 if payment_type == 'charge':
                     resp = univapay.get_charge(payment_id)
@@ -1568,9 +1445,11 @@ class PaymentStatusView(APIView):
                     }, status=status.HTTP_400_BAD_REQUEST)
 
                 # Update local payment record if it exists
-                payment = PaymentHistory.objects.filter(
-                    univapay_id=payment_id, 
-                    user=request.user
+                payment = PaymentHistorySerializer.setup_eager_loading(
+                    PaymentHistory.objects.filter(
+                        univapay_id=payment_id,
+                        user=request.user
+                    )
                 ).first()
                 
                 if payment:
@@ -1713,9 +1592,11 @@ class SubscriptionStatusView(APIView):
         
         try:
             # Get the most recent subscription for the user (regardless of status)
-            latest_subscription = PaymentHistory.objects.filter(
-                user=request.user,
-                payment_type='recurring'
+            latest_subscription = PaymentHistorySerializer.setup_eager_loading(
+                PaymentHistory.objects.filter(
+                    user=request.user,
+                    payment_type='recurring'
+                )
             ).order_by('-created_at').first()
             
             
@@ -1979,38 +1860,40 @@ class WebhookView(APIView):
     
     def _handle_charge_event(self, data):
         """Handle charge-related webhook events."""
-        print(f"[DEBUG] WebhookView._handle_charge_event - Processing charge event")
+        logger.debug("Processing charge webhook event")
         charge_data = data.get('data') or data
         charge_id = charge_data.get('id')
         
         if not charge_id:
-            print(f"[DEBUG] WebhookView._handle_charge_event - No charge ID found")
+            logger.debug("Charge webhook event has no charge ID")
             return
         
-        payment = PaymentHistory.objects.filter(
+        # Apply the event with a single UPDATE of the columns it carries,
+        # instead of loading the row and saving every column back
+        changes = {'updated_at': now()}
+        if charge_data.get('status'):
+            changes['status'] = charge_data['status']
+        
+        # Update amounts if provided
+        if charge_data.get('charged_amount'):
+            changes['charged_amount'] = charge_data['charged_amount']
+        if charge_data.get('charged_currency'):
+            changes['charged_currency'] = charge_data['charged_currency']
+        
+        # Update error information
+        error_info = charge_data.get('error', {})
+        if error_info:
+            changes['error_code'] = error_info.get('code')
+            changes['error_message'] = error_info.get('message')
+            changes['error_detail'] = error_info.get('detail')
+        
+        updated = PaymentHistory.objects.filter(
             univapay_id=charge_id,
             payment_type='one_time'
-        ).first()
+        ).update(**empty_json_as_null(changes, PaymentHistory.OPTIONAL_JSON_FIELDS))
         
-        if payment:
-            # Update payment status
-            payment.status = charge_data.get('status', payment.status)
-            
-            # Update amounts if provided
-            if charge_data.get('charged_amount'):
-                payment.charged_amount = charge_data['charged_amount']
-            if charge_data.get('charged_currency'):
-                payment.charged_currency = charge_data['charged_currency']
-            
-            # Update error information
-            error_info = charge_data.get('error', {})
-            if error_info:
-                payment.error_code = error_info.get('code')
-                payment.error_message = error_info.get('message')
-                payment.error_detail = error_info.get('detail')
-            
-            payment.save()
-            print(f"[DEBUG] WebhookView._handle_charge_event - Updated charge {charge_id} status to {payment.status}")
+        if updated:
+            logger.debug("Updated charge %s status to %s", charge_id, changes.get('status'))
     
     def _handle_subscription_event(self, data):
         """Handle subscription-related webhook events."""
@@ -2020,32 +1903,32 @@ class WebhookView(APIView):
         if not sub_id:
             return
         
-        payment = PaymentHistory.objects.filter(
+        changes = {'updated_at': now()}
+        if sub_data.get('status'):
+            changes['status'] = sub_data['status']
+        
+        # Update cancellation info
+        if sub_data.get('cancelled_on'):
+            changes['cancelled_on'] = parse_datetime(sub_data['cancelled_on'])
+        
+        # Update next payment information
+        next_payment = sub_data.get('next_payment', {})
+        if next_payment:
+            changes['next_payment_id'] = next_payment.get('id')
+            changes['next_payment_due_date'] = next_payment.get('due_date')
+            changes['next_payment_amount'] = next_payment.get('amount')
+            changes['next_payment_currency'] = next_payment.get('currency')
+            changes['next_payment_is_paid'] = next_payment.get('is_paid', False)
+            changes['next_payment_is_last_payment'] = next_payment.get('is_last_payment', False)
+            changes['next_payment_retry_date'] = next_payment.get('retry_date')
+        
+        updated = PaymentHistory.objects.filter(
             univapay_id=sub_id,
             payment_type='recurring'
-        ).first()
+        ).update(**empty_json_as_null(changes, PaymentHistory.OPTIONAL_JSON_FIELDS))
         
-        if payment:
-            # Update subscription status
-            payment.status = sub_data.get('status', payment.status)
-            
-            # Update cancellation info
-            if sub_data.get('cancelled_on'):
-                payment.cancelled_on = parse_datetime(sub_data['cancelled_on'])
-            
-            # Update next payment information
-            next_payment = sub_data.get('next_payment', {})
-            if next_payment:
-                payment.next_payment_id = next_payment.get('id')
-                payment.next_payment_due_date = next_payment.get('due_date')
-                payment.next_payment_amount = next_payment.get('amount')
-                payment.next_payment_currency = next_payment.get('currency')
-                payment.next_payment_is_paid = next_payment.get('is_paid', False)
-                payment.next_payment_is_last_payment = next_payment.get('is_last_payment', False)
-                payment.next_payment_retry_date = next_payment.get('retry_date')
-            
-            payment.save()
-            print(f"[DEBUG] WebhookView._handle_subscription_event - Updated subscription {sub_id} status to {payment.status}")
+        if updated:
+            logger.debug("Updated subscription %s status to %s", sub_id, changes.get('status'))
     
     def _handle_refund_event(self, data):
         """Handle refund-related webhook events."""
@@ -2068,7 +1951,7 @@ class WebhookView(APIView):
             else:
                 payment.status = 'refunded'
             
-            payment.save()
+            payment.save(update_fields=['status', 'updated_at'])
             print(f"[DEBUG] WebhookView._handle_refund_event - Updated charge {charge_id} to refunded status")
 
 
@@ -42,4 +42,8 @@ app.conf.beat_schedule = {
         'task': 'accounts.tasks.delete_unverified_users',
         'schedule': timedelta(hours=12),
     },
+    'delete-expired-edit-request-downloads-every-hour': {
+        'task': 'gallery.tasks.delete_expired_edit_request_downloads',
+        'schedule': crontab(minute=0),
+    },
 }
\ No newline at end of file
@@ -23,6 +23,8 @@ AWS_S3_OBJECT_PARAMETERS = {
     "CacheControl": "max-age=86400",
 }
 AWS_DEFAULT_ACL = None  # Important for newer AWS behavior
+# Downloaded files spill to disk past this size instead of staying in memory
+AWS_S3_MAX_MEMORY_SIZE = 1024 * 1024
 
 # --- STATIC FILES ---
 STATIC_URL = f'https://{AWS_S3_CUSTOM_DOMAIN}/static/'